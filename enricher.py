@@ -0,0 +1,296 @@
+# enricher.py — optional lead-page enrichment (publish date, author, contact links)
+import re, json, codecs, threading, requests
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+from leads import Lead
+
+USER_AGENT = "LeadHunterAI:v1.0 (by u/samadhidagreat)"
+MAX_BYTES = 512 * 1024        # stop reading a page after this many bytes
+PER_HOST_LIMIT = 2            # concurrent connections per host
+MAX_WORKERS = 8
+TIMEOUT = 8
+CACHE_SIZE = 2048
+
+TRACKING_PARAMS = re.compile(r"^(utm_.*|fbclid|gclid|ref|ref_src|s)$")
+SOCIAL_HOSTS = ("twitter.com", "x.com", "linkedin.com", "facebook.com", "instagram.com")
+
+RETRYABLE_STATUS = (408, 429)  # plus any 5xx; other non-200s are permanent and cached as empty
+
+class EnrichError(Exception):
+    # transient failure (network, 5xx/408/429, robots.txt unreachable); never cached
+    pass
+
+def _retryable(status: int) -> bool:
+    return status >= 500 or status in RETRYABLE_STATUS
+
+def canonical_url(url: str) -> str:
+    # lowercase scheme/host, drop fragment, default port, tracking params and trailing slash;
+    # a URL too malformed to split (bad port, broken IPv6 host) is returned stripped
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k)])
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(((parts.scheme or "https").lower(), host, path, query, ""))
+
+class _PageParser(HTMLParser):
+    # Fed chunk by chunk while the body streams in
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.canonical: Optional[str] = None
+        self.published: Optional[str] = None
+        self.author: Optional[str] = None
+        self.contacts: List[str] = []
+        self._in_ld_json = False
+        self._ld_buf: List[str] = []
+
+    def _add_contact(self, href: str) -> None:
+        if href not in self.contacts and len(self.contacts) < 10:
+            self.contacts.append(href)
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        a = {k.lower(): (v or "") for k, v in attrs}
+        if tag == "meta":
+            key = (a.get("property") or a.get("name") or a.get("itemprop") or "").lower()
+            content = a.get("content", "").strip()
+            if not content:
+                return
+            if key in ("article:published_time", "datepublished", "date", "pubdate", "og:published_time") and not self.published:
+                self.published = content
+            elif key in ("twitter:creator", "author", "article:author") and not self.author:
+                self.author = content
+        elif tag == "link":
+            rel = a.get("rel", "").lower()
+            if rel == "canonical" and a.get("href"):
+                self.canonical = urljoin(self.base_url, a["href"])
+            elif rel == "author" and a.get("href") and not self.author:
+                self.author = a["href"]
+        elif tag == "time" and a.get("datetime") and not self.published:
+            self.published = a["datetime"]
+        elif tag == "script" and a.get("type", "").lower() == "application/ld+json":
+            self._in_ld_json = True
+            self._ld_buf = []
+        elif tag == "a" and a.get("href"):
+            href = a["href"].strip()
+            low = href.lower()
+            if low.startswith(("mailto:", "tel:")):
+                self._add_contact(href)
+            else:
+                full = urljoin(self.base_url, href)
+                host = (urlsplit(full).hostname or "").lower()
+                if "contact" in low or any(host == h or host.endswith("." + h) for h in SOCIAL_HOSTS):
+                    self._add_contact(full)
+
+    def handle_data(self, data: str) -> None:
+        if self._in_ld_json:
+            self._ld_buf.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "script" and self._in_ld_json:
+            self._in_ld_json = False
+            try:
+                ld = json.loads("".join(self._ld_buf))
+            except ValueError:
+                return
+            for node in ld if isinstance(ld, list) else [ld]:
+                if not isinstance(node, dict):
+                    continue
+                if not self.published and node.get("datePublished"):
+                    self.published = str(node["datePublished"])
+                author = node.get("author")
+                if isinstance(author, list) and author:
+                    author = author[0]
+                if isinstance(author, dict):
+                    author = author.get("name") or author.get("url")
+                if author and not self.author:
+                    self.author = str(author)
+
+class Enricher:
+    def __init__(self, max_workers: int = MAX_WORKERS, per_host: int = PER_HOST_LIMIT,
+                 max_bytes: int = MAX_BYTES, timeout: float = TIMEOUT, cache_size: int = CACHE_SIZE,
+                 session: Optional[requests.Session] = None):
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enrich")
+        self._session = session or requests.Session()
+        self._session.headers["User-Agent"] = USER_AGENT
+        self._lock = threading.Lock()
+        # per-host queues: at most per_host jobs of one host are handed to the pool at a
+        # time, so workers never sit blocked on a busy host while other hosts wait
+        self._queued: Dict[str, deque] = {}
+        self._active: Dict[str, int] = {}
+        # origin -> Future[RobotFileParser], one shared robots.txt fetch per origin
+        self._robots: Dict[str, Future] = {}
+        # canonical URL -> Future, so concurrent and repeat requests share one fetch
+        self._cache: "OrderedDict[str, Future]" = OrderedDict()
+
+    def _load_robots(self, origin: str) -> RobotFileParser:
+        rp = RobotFileParser()
+        try:
+            # streamed and capped like page bodies; rules past max_bytes are ignored
+            with self._session.get(origin + "/robots.txt", timeout=self.timeout, stream=True) as r:
+                if r.status_code in (401, 403):
+                    rp.disallow_all = True
+                elif _retryable(r.status_code):
+                    raise EnrichError(f"robots.txt for {origin} returned {r.status_code}")
+                elif r.status_code >= 400:
+                    rp.allow_all = True
+                else:
+                    body = bytearray()
+                    for chunk in r.iter_content(chunk_size=16384):
+                        body += chunk
+                        if len(body) >= self.max_bytes:
+                            break
+                    rp.parse(bytes(body[:self.max_bytes]).decode("utf-8", errors="replace").splitlines())
+        except requests.RequestException as e:
+            raise EnrichError(f"robots.txt unreachable for {origin}: {e}")
+        return rp
+
+    def _allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            fut = self._robots.get(origin)
+            owner = fut is None
+            if owner:
+                fut = self._robots[origin] = Future()
+        if owner:
+            try:
+                fut.set_result(self._load_robots(origin))
+            except Exception as e:
+                with self._lock:
+                    self._robots.pop(origin, None)  # retry on a later request
+                fut.set_exception(e)
+        return fut.result(timeout=self.timeout * 2).can_fetch(USER_AGENT, url)
+
+    def _fetch(self, url: str) -> Dict[str, Any]:
+        empty = {"published": None, "author": None, "contacts": [], "canonical_url": canonical_url(url)}
+        if not self._allowed(url):
+            return empty
+        parser = _PageParser(url)
+        try:
+            with self._session.get(url, timeout=self.timeout, stream=True) as r:
+                if r.status_code != 200:
+                    if _retryable(r.status_code):
+                        raise EnrichError(f"{url} returned {r.status_code}")
+                    return empty  # 404, 410, ...: permanent, so cache the empty result
+                ctype = r.headers.get("Content-Type", "html").lower()
+                if "html" not in ctype:
+                    return empty
+                # requests assumes ISO-8859-1 for text/* without a charset; pages are far more often UTF-8
+                encoding = (r.encoding if "charset=" in ctype else None) or "utf-8"
+                try:
+                    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                except LookupError:
+                    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                read = 0
+                for chunk in r.iter_content(chunk_size=16384):
+                    read += len(chunk)
+                    parser.feed(decoder.decode(chunk))
+                    if read >= self.max_bytes:
+                        break
+        except requests.RequestException as e:
+            raise EnrichError(f"fetch failed for {url}: {e}")
+        return {
+            "published": parser.published,
+            "author": parser.author,
+            "contacts": parser.contacts,
+            "canonical_url": canonical_url(parser.canonical) if parser.canonical else canonical_url(url),
+        }
+
+    def _pump(self, host: str) -> None:
+        # caller holds self._lock
+        queue = self._queued.get(host)
+        while queue and self._active.get(host, 0) < self.per_host:
+            url, fut = queue.popleft()
+            if fut.set_running_or_notify_cancel():
+                self._active[host] = self._active.get(host, 0) + 1
+                self._pool.submit(self._run, host, url, fut)
+        if not queue:
+            self._queued.pop(host, None)
+
+    def _run(self, host: str, url: str, fut: Future) -> None:
+        try:
+            result = self._fetch(url)
+        except Exception as e:
+            fut.set_exception(e)
+        else:
+            fut.set_result(result)
+        finally:
+            with self._lock:
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+                self._pump(host)
+
+    def enrich_url(self, url: str) -> Future:
+        key = canonical_url(url)
+        with self._lock:
+            fut = self._cache.get(key)
+            if fut is not None:
+                self._cache.move_to_end(key)
+                return fut
+            fut = Future()
+            fut.add_done_callback(lambda f: self._settle(key, f))
+            self._cache[key] = fut
+            self._evict()
+            host = (urlsplit(key).hostname or "").lower()
+            self._queued.setdefault(host, deque()).append((url, fut))
+            self._pump(host)
+        return fut
+
+    def _settle(self, key: str, fut: Future) -> None:
+        with self._lock:
+            if fut.cancelled() or fut.exception() is not None:
+                # only successful results stay cached; a transient failure is retried next time
+                if self._cache.get(key) is fut:
+                    del self._cache[key]
+                return
+            # also file the result under the page's own <link rel=canonical>, same host only
+            alias = fut.result()["canonical_url"]
+            if urlsplit(alias).hostname == urlsplit(key).hostname and alias not in self._cache:
+                self._cache[alias] = fut
+                self._evict()
+
+    def _evict(self) -> None:
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def enrich(self, items: List[Lead]) -> List[Lead]:
+        # sets .enrichment on each lead with an http(s) url, within one overall deadline; never raises
+        pending = []
+        for it in items:
+            if (it.url or "").startswith(("http://", "https://")):
+                try:
+                    pending.append((it, self.enrich_url(it.url)))
+                except ValueError as e:
+                    print(f"Enrich skipped {it.url}: {e}")
+        if not pending:
+            return items
+        done, _ = wait([fut for _, fut in pending], timeout=self.timeout * 3)
+        for it, fut in pending:
+            if fut in done and fut.exception() is None:
+                it.enrichment = fut.result()
+        failed = len(pending) - sum(1 for it, _ in pending if it.enrichment is not None)
+        if failed:
+            print(f"Enrich: {failed} of {len(pending)} pages failed or timed out")
+        return items
+
+ENRICHER = Enricher()
+
+def enrich_leads(items: List[Lead]) -> List[Lead]:
+    return ENRICHER.enrich(items)
@@ -0,0 +1,172 @@
+# failover.py — latency-aware provider failover with hedged requests
+import math, time, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ERROR_WINDOW = 60.0      # seconds an error keeps counting against a provider
+ERROR_TOLERANCE = 0.25   # recent error rate a provider may have before it is demoted
+MIN_ERRORS = 2           # ...and how many recent errors, so one transient 5xx never demotes
+
+class ProviderStats:
+    # Rolling window of latencies (successful calls only) and timestamped outcomes for one provider
+    def __init__(self, window: int = 100, error_window: float = ERROR_WINDOW):
+        self._latencies: deque = deque(maxlen=window)
+        self._outcomes: deque = deque(maxlen=window)
+        self.error_window = error_window
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._outcomes.append((time.monotonic(), ok))
+            if ok:
+                self._latencies.append(latency)
+
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            data = sorted(self._latencies)
+        if not data:
+            return None
+        idx = min(len(data) - 1, max(0, math.ceil(pct / 100.0 * len(data)) - 1))
+        return data[idx]
+
+    def recent_errors(self) -> Tuple[int, int]:
+        # (errors, calls) within the last error_window seconds; older errors have decayed
+        cutoff = time.monotonic() - self.error_window
+        with self._lock:
+            recent = [ok for ts, ok in self._outcomes if ts >= cutoff]
+        return recent.count(False), len(recent)
+
+    def error_rate(self) -> float:
+        errors, calls = self.recent_errors()
+        return errors / calls if calls else 0.0
+
+    def healthy(self) -> bool:
+        errors, calls = self.recent_errors()
+        return errors < MIN_ERRORS or errors / calls <= ERROR_TOLERANCE
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+        return {
+            "calls": calls,
+            "error_rate": round(self.error_rate(), 3),
+            "healthy": self.healthy(),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+class HedgedFailover:
+    """Call one of several interchangeable providers, hedging slow calls.
+
+    Healthy providers (recent errors within tolerance) go first, fastest p50
+    first. If the first has not answered by its own rolling p90, measured from
+    when the call actually started, the next provider is started as well and
+    whichever succeeds first wins; an error fails over immediately. No hedge is
+    sent while the pool has no idle worker, so queueing never buys a duplicate.
+    Losing calls are cancelled if not yet running, otherwise their result is
+    discarded (a blocking HTTP request cannot be interrupted) but still timed.
+    """
+
+    # sized to FastAPI's sync threadpool (40) so every request thread can get a worker
+    def __init__(self, providers: Dict[str, Callable[..., Any]], window: int = 100,
+                 min_samples: int = 10, default_hedge_after: float = 2.0, max_workers: int = 40):
+        if not providers:
+            raise ValueError("HedgedFailover needs at least one provider")
+        self.providers = dict(providers)
+        self.stats = {name: ProviderStats(window) for name in self.providers}
+        self.min_samples = min_samples
+        self.default_hedge_after = default_hedge_after
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="failover")
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+
+    def ranked(self) -> List[str]:
+        order = list(self.providers)
+        def health(name: str) -> Tuple[bool, float]:
+            st = self.stats[name]
+            p50 = st.percentile(50) if st.samples() >= self.min_samples else None
+            return (not st.healthy(), p50 if p50 is not None else self.default_hedge_after)
+        return sorted(order, key=lambda n: (health(n), order.index(n)))
+
+    def hedge_delay(self, name: str) -> float:
+        st = self.stats[name]
+        if st.samples() < self.min_samples:
+            return self.default_hedge_after
+        return st.percentile(90) or self.default_hedge_after
+
+    def _idle_worker(self) -> bool:
+        with self._busy_lock:
+            return self._busy < self.max_workers
+
+    def _timed(self, name: str, started: threading.Event, args: tuple, kwargs: dict) -> Any:
+        with self._busy_lock:
+            self._busy += 1
+        start = time.monotonic()
+        started.set()
+        try:
+            result = self.providers[name](*args, **kwargs)
+        except Exception:
+            self.stats[name].record(time.monotonic() - start, False)
+            raise
+        finally:
+            with self._busy_lock:
+                self._busy -= 1
+        self.stats[name].record(time.monotonic() - start, True)
+        return result
+
+    def call(self, *args, **kwargs) -> Tuple[Any, str]:
+        # Returns (result, provider_name); raises the last error if every provider fails
+        queue = self.ranked()
+        pending: Dict[Any, str] = {}
+        last_exc: Optional[BaseException] = None
+
+        latest: Dict[str, Any] = {}
+
+        def launch() -> None:
+            name = queue.pop(0)
+            started = threading.Event()
+            pending[self._pool.submit(self._timed, name, started, args, kwargs)] = name
+            latest.update(name=name, started=started, at=None)
+
+        def hedge_timeout() -> Optional[float]:
+            # seconds until the newest call passes its p90, counted from when it started
+            if not queue:
+                return None
+            if latest["at"] is None:
+                if not latest["started"].wait(timeout=0.05):
+                    return 0.05  # still queued in the pool; poll until it starts
+                latest["at"] = time.monotonic() + self.hedge_delay(latest["name"])
+            remaining = latest["at"] - time.monotonic()
+            return remaining if remaining > 0 else 0.05  # overdue but pool full: re-check shortly
+
+        launch()
+        while pending:
+            timeout = hedge_timeout()
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if latest["at"] is not None and time.monotonic() >= latest["at"] and self._idle_worker():
+                    # newest call is past its p90 and a worker is free: send the duplicate request
+                    launch()
+                continue
+            for fut in done:
+                name = pending.pop(fut)
+                exc = fut.exception()
+                if exc is None:
+                    for other in pending:
+                        other.cancel()
+                    return fut.result(), name
+                last_exc = exc
+            if queue:
+                # a provider errored: fail over without waiting for the hedge delay
+                launch()
+        raise last_exc if last_exc else RuntimeError("no provider answered")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: st.snapshot() for name, st in self.stats.items()}
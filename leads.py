@@ -0,0 +1,75 @@
+# leads.py — compact lead records and a fast JSON response for them
+import json
+from typing import Any, Dict, Optional, Tuple
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speedup; falls back to the stdlib encoder
+    orjson = None
+
+class Lead:
+    # Fixed slots instead of a per-lead dict. `text` is the lowercased
+    # "title snippet" string, built once and reused by every matcher.
+    __slots__ = ("title", "url", "snippet", "text", "enrichment")
+    _fields: Tuple[str, ...] = ("title", "url", "snippet")
+    _optional: Tuple[str, ...] = ("enrichment",)
+
+    def __init__(self, title: Optional[str], url: Optional[str], snippet: Optional[str]):
+        self.title = title
+        self.url = url
+        self.snippet = snippet
+        self.text = f"{title or ''} {snippet or ''}".lower()
+        self.enrichment: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {f: getattr(self, f) for f in self._fields}
+        for f in self._optional:
+            v = getattr(self, f)
+            if v is not None:
+                out[f] = v
+        return out
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class SearchLead(Lead):
+    # SearchAPI.io / Serply organic and news results (main_api.py)
+    __slots__ = ("source", "date")
+    _fields = ("title", "snippet", "url", "source", "date")
+
+    def __init__(self, title: Optional[str], url: Optional[str], snippet: Optional[str], source: str, date: Optional[str] = None):
+        super().__init__(title, url, snippet)
+        self.source = source
+        self.date = date
+
+class ScrapedLead(Lead):
+    # Scored leads from scraper.py / main.py
+    __slots__ = ("platform", "lead_score", "detected_service", "detected_location")
+    _fields = ("platform", "title", "url", "snippet", "lead_score")
+    _optional = ("detected_service", "detected_location", "enrichment")
+
+    def __init__(self, platform: str, title: str, url: str, snippet: str, lead_score: str = "",
+                 detected_service: Optional[str] = None, detected_location: Optional[str] = None):
+        super().__init__(title, url, snippet)
+        self.platform = platform
+        self.lead_score = lead_score
+        self.detected_service = detected_service
+        self.detected_location = detected_location
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Lead):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class LeadJSONResponse(Response):
+    # Return an instance directly from an endpoint to skip FastAPI's jsonable_encoder pass
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
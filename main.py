@@ -4,6 +4,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import os
 
 app = FastAPI(title="LeadHunter AI")
@@ -202,8 +203,12 @@ import requests
 from typing import List, Dict
 from dotenv import load_dotenv
 import praw
+from failover import HedgedFailover
+from enricher import enrich_leads
+from leads import ScrapedLead, LeadJSONResponse
 
 load_dotenv()
+from scraper_searchapi import SEARCHAPI_KEY  # after load_dotenv: it reads the key at import
 
 SERPLY_API_KEY = os.getenv("SERPLY_API_KEY")
 if not SERPLY_API_KEY:
@@ -233,62 +238,92 @@ PLATFORM_SOURCES = {
     "reddit": ("reddit", "posts", "")
 }
 
-def is_high_intent(title: str, snippet: str) -> bool:
+def is_high_intent(text: str) -> bool:
+    # text is a lead's pre-lowercased "title snippet"
     triggers = ["looking for", "need help", "recommend", "best", "any good"]
-    text = f"{title} {snippet}".lower()
     return any(trigger in text for trigger in triggers)
 
-def fetch_serply(keyword: str, endpoint: str, query: str = "") -> List[Dict]:
+def _lead(platform: str, title: str, url: str, snippet: str) -> ScrapedLead:
+    snippet = snippet or "No description"
+    lead = ScrapedLead(platform, title or "No title", url or "#", snippet[:200] + "...")
+    # score the full snippet/selftext, not the 200-char display cut
+    text = lead.text if len(snippet) <= 200 else f"{title or ''} {snippet}".lower()
+    lead.lead_score = "🔥 Hot Lead" if is_high_intent(text) else "🟡 Warm Lead"
+    return lead
+
+def fetch_serply(keyword: str, endpoint: str, query: str = "") -> List[ScrapedLead]:
     base = "https://api.serply.io/v1/google"
     url = f"{base}/{endpoint}" if endpoint != "organic" else base
     q = f"{query} {keyword}".strip()
     try:
         resp = requests.get(url, headers=SERPLY_HEADERS, params={"q": q}, timeout=10)
         if resp.status_code == 200:
-            return [
-                {
-                    "platform": "Google",
-                    "title": r.get("title", "No title"),
-                    "url": r.get("link", "#"),
-                    "snippet": r.get("snippet", "No description")[:200] + "...",
-                    "lead_score": "🔥 Hot Lead" if is_high_intent(r.get("title",""), r.get("snippet","")) else "🟡 Warm Lead"
-                }
-                for r in resp.json().get("results", [])
-            ]
+            return [_lead("Google", r.get("title"), r.get("link"), r.get("snippet")) for r in resp.json().get("results", [])]
         return []
     except:
         return []
 
-def fetch_reddit(keyword: str) -> List[Dict]:
+# Unlike fetch_serply these raise on failure so the failover can count errors
+def _serply_organic(keyword: str) -> List[ScrapedLead]:
+    resp = requests.get("https://api.serply.io/v1/google", headers=SERPLY_HEADERS, params={"q": keyword}, timeout=10)
+    resp.raise_for_status()
+    return [_lead("Google", r.get("title"), r.get("link"), r.get("snippet")) for r in resp.json().get("results", [])]
+
+def _searchapi_organic(keyword: str) -> List[ScrapedLead]:
+    params = {"engine": "google", "q": keyword, "api_key": SEARCHAPI_KEY}
+    resp = requests.get("https://www.searchapi.io/api/v1/search", params=params, timeout=10)
+    resp.raise_for_status()
+    return [_lead("Google", r.get("title"), r.get("link"), r.get("snippet")) for r in resp.json().get("organic_results", [])]
+
+_GOOGLE_PROVIDERS = {}
+if SERPLY_API_KEY:
+    _GOOGLE_PROVIDERS["serply"] = _serply_organic
+if SEARCHAPI_KEY:
+    _GOOGLE_PROVIDERS["searchapi"] = _searchapi_organic
+GOOGLE_FAILOVER = HedgedFailover(_GOOGLE_PROVIDERS) if _GOOGLE_PROVIDERS else None
+
+def fetch_google(keyword: str) -> List[ScrapedLead]:
+    # hedged across whichever of Serply / SearchAPI.io are configured
+    if not GOOGLE_FAILOVER:
+        return []
+    try:
+        results, _provider = GOOGLE_FAILOVER.call(keyword)
+        return results
+    except Exception:
+        return []
+
+def fetch_reddit(keyword: str) -> List[ScrapedLead]:
     if not REDDIT: return []
     try:
         return [
-            {
-                "platform": "Reddit",
-                "title": sub.title,
-                "url": f"https://reddit.com{sub.permalink}",
-                "snippet": (sub.selftext or sub.title)[:200] + "...",
-                "lead_score": "🔥 Hot Lead" if is_high_intent(sub.title, sub.selftext or "") else "🟡 Warm Lead"
-            }
+            _lead("Reddit", sub.title, f"https://reddit.com{sub.permalink}", sub.selftext or sub.title)
             for sub in REDDIT.subreddit("all").search(keyword, limit=5)
         ]
     except:
         return []
 
-@app.get("/search")
-async def search(keyword: str = "", platforms: str = ""):
+@app.get("/search", response_class=LeadJSONResponse)
+async def search(keyword: str = "", platforms: str = "", enrich: bool = False):
     if not keyword.strip():
         return {"results": []}
     platform_list = [p.strip() for p in platforms.split(",") if p.strip()] or ["google", "reddit"]
     results = []
     for platform in platform_list:
         if platform == "google":
-            results += fetch_serply(keyword, "organic")
+            # the hedged failover blocks while it waits on providers; keep it off the event loop
+            results += await run_in_threadpool(fetch_google, keyword)
         elif platform == "news":
             results += fetch_serply(keyword, "news")
         elif platform == "reddit" and REDDIT:
             results += fetch_reddit(keyword)
-    return {"results": results}
+    if enrich:
+        # page fetches can take tens of seconds; keep them off the event loop
+        results = await run_in_threadpool(enrich_leads, results)
+    return LeadJSONResponse({"results": results})
+
+@app.get("/providers")
+async def providers():
+    return {"google": GOOGLE_FAILOVER.snapshot() if GOOGLE_FAILOVER else {}}
 
 # === GENERATOR LOGIC (Smart Templates) ===
 def generate_message(service: str, tone: str, location: str, context: str) -> str:
@@ -3,7 +3,9 @@
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional, Dict, Any
-from scraper_searchapi import search_aggregate
+from scraper_searchapi import search_aggregate, GOOGLE_FAILOVER
+from enricher import enrich_leads
+from leads import LeadJSONResponse
 
 app = FastAPI(title="LeadHunter AI - SearchAPI.io")
 
@@ -19,22 +21,35 @@ app.add_middleware(
 def health():
     return {"ok": True}
 
-@app.get("/search")
+@app.get("/providers")
+def providers():
+    # rolling latency percentiles (seconds) and error rates per Google provider
+    return {"google": GOOGLE_FAILOVER.snapshot()}
+
+@app.get("/search", response_class=LeadJSONResponse)
 def search(
     q: str = Query(..., min_length=1, description="Search query; wrap in quotes for phrases"),
-    platforms: Optional[List[str]] = Query(None, description="e.g., google, news, twitter"),
+    platforms: Optional[List[str]] = Query(None, description="e.g., google, news, twitter, youtube, stackoverflow"),
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=50),
     sort: str = Query("relevance", pattern="^(relevance|newest)$"),
     only_accounts: bool = Query(False, description="Return only account/profile style results when possible"),
-) -> Dict[str, Any]:
+    enrich: bool = Query(False, description="Fetch each lead page for publish date, author and contact links"),
+) -> LeadJSONResponse:
     platforms = platforms or ["google"]
-    items, total = search_aggregate(q=q, platforms=platforms, page=page, per_page=per_page, sort=sort, only_accounts=only_accounts)
-    return {
+    items, total, plan, google_providers = search_aggregate(q=q, platforms=platforms, page=page, per_page=per_page, sort=sort, only_accounts=only_accounts)
+    if enrich:
+        items = enrich_leads(items)
+    return LeadJSONResponse({
         "query": q,
         "page": page,
         "per_page": per_page,
         "total": total,
         "count": len(items),
         "items": items,
-    }
+        "upstream_calls": plan["upstream_calls"],
+        "calls_saved": plan["calls_saved"],
+        "topup_calls": plan["topup_calls"],
+        # "total" is Google's estimate from SearchAPI.io but Serply's returned count
+        "google_providers": google_providers,
+    })
@@ -0,0 +1,98 @@
+# planner.py — merges site-restricted platforms into fewer upstream search calls
+from typing import Callable, Dict, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+MAX_SITES_PER_QUERY = 6  # keeps the OR clause well inside Google's 32-word query limit
+
+# Other hosts a platform's results come back on
+SITE_ALIASES = {"twitter.com": ("x.com",), "youtube.com": ("youtu.be",)}
+
+class QueryGroup:
+    # One upstream call. `sites` maps platform -> domain for site-restricted
+    # platforms (empty for an unrestricted one like plain google/news).
+    __slots__ = ("endpoint", "platforms", "sites")
+
+    def __init__(self, endpoint: str, platforms: List[str], sites: Dict[str, str]):
+        self.endpoint = endpoint
+        self.platforms = platforms
+        self.sites = sites
+
+    @property
+    def merged(self) -> bool:
+        return len(self.platforms) > 1
+
+    @property
+    def site_filter(self) -> str:
+        # "site:a.com" or "(site:a.com OR site:b.com)"; "" when unrestricted
+        clauses = [f"site:{d}" for d in self.sites.values()]
+        if len(clauses) <= 1:
+            return "".join(clauses)
+        return "(" + " OR ".join(clauses) + ")"
+
+    def query(self, keyword: str) -> str:
+        return f"{self.site_filter} {keyword}".strip()
+
+    def __repr__(self) -> str:
+        return f"QueryGroup({self.endpoint!r}, {self.platforms!r})"
+
+def plan_queries(platforms: Sequence[str], sources: Dict[str, Tuple[str, str]],
+                 max_sites: int = MAX_SITES_PER_QUERY, merge: bool = True) -> Tuple[List[QueryGroup], int]:
+    # sources: platform -> (endpoint, site domain or "").
+    # Returns the groups to call and how many upstream calls merging saved.
+    # Pass merge=False past page 1: a merged page N does not start at rank N of each site.
+    groups: List[QueryGroup] = []
+    open_groups: Dict[str, QueryGroup] = {}
+    wanted = [p for p in dict.fromkeys(platforms) if p in sources]
+    for p in wanted:
+        endpoint, site = sources[p]
+        if not site:
+            groups.append(QueryGroup(endpoint, [p], {}))
+            continue
+        g = open_groups.get(endpoint)
+        if g is None or len(g.sites) >= max_sites or not merge:
+            g = QueryGroup(endpoint, [], {})
+            open_groups[endpoint] = g
+            groups.append(g)
+        g.platforms.append(p)
+        g.sites[p] = site
+    return groups, len(wanted) - len(groups)
+
+def _on_site(url: str, domain: str) -> bool:
+    host = (urlsplit(url or "").hostname or "").lower()
+    return any(host == d or host.endswith("." + d) for d in (domain,) + SITE_ALIASES.get(domain, ()))
+
+def split_by_site(group: QueryGroup, leads: List, limit: int = 0) -> Dict[str, List]:
+    # Attribute a merged call's results back to platforms by URL domain (or its aliases).
+    # Leads on none of the group's domains are dropped; `limit` caps each platform.
+    out: Dict[str, List] = {p: [] for p in group.platforms}
+    if not group.merged:
+        out[group.platforms[0]] = leads[:limit] if limit else list(leads)
+        return out
+    for lead in leads:
+        for p, domain in group.sites.items():
+            if _on_site(lead.url, domain):
+                if not limit or len(out[p]) < limit:
+                    out[p].append(lead)
+                break
+    return out
+
+def top_up(group: QueryGroup, split: Dict[str, List], leads: List, requested: int, limit: int,
+           fetch_site: Callable[[str], List]) -> int:
+    # When one domain dominates a full merged page, re-query the platforms that came back
+    # short with their own site: call so merging never costs recall. Returns calls made.
+    # Domination means on-domain results were dropped by another platform's cap; a short
+    # page, or one padded with off-domain results, has nothing more to give.
+    if not group.merged or len(leads) < requested:
+        return 0
+    on_domain = sum(1 for lead in leads if any(_on_site(lead.url, d) for d in group.sites.values()))
+    if on_domain <= sum(len(v) for v in split.values()):
+        return 0
+    calls = 0
+    for p, domain in group.sites.items():
+        if len(split[p]) >= limit:
+            continue
+        calls += 1
+        seen = {lead.url for lead in split[p]}
+        extra = [lead for lead in fetch_site(f"site:{domain}") if lead.url not in seen]
+        split[p].extend(extra[:limit - len(split[p])])
+    return calls
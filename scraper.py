@@ -1,10 +1,12 @@
 # backend/scraper.py
 import os
 import requests
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from dotenv import load_dotenv
 import praw
 import logging
+from leads import ScrapedLead
+from planner import plan_queries, split_by_site, top_up
 
 logging.getLogger("praw").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -47,33 +49,38 @@ PLATFORM_SOURCES = {
 }
 
 # === Lead Intelligence Functions ===
-def is_high_intent(title: str, snippet: str) -> bool:
+# All take a lead's pre-lowercased "title snippet" text (ScrapedLead.text)
+def is_high_intent(text: str) -> bool:
     triggers = ["looking for", "need help", "recommend", "best", "any good", "suggest", "where to find", "hire a", "need a", "searching for"]
-    text = f"{title} {snippet}".lower()
-    return any(trigger in text for trigger)
+    return any(trigger in text for trigger in triggers)
 
-def detect_service(title: str, snippet: str) -> str:
-    services = ["web developer", "plumber", "lawyer", "graphic designer", "marketing agency", "tutor", "electrician", "cleaning service", "accountant", "photographer", "consultant", "SEO expert"]
-    text = f"{title} {snippet}".lower()
+def detect_service(text: str) -> str:
+    services = ["web developer", "plumber", "lawyer", "graphic designer", "marketing agency", "tutor", "electrician", "cleaning service", "accountant", "photographer", "consultant", "seo expert"]
     for s in services:
         if s in text:
             return s.title()
     return ""
 
-def detect_location(title: str, snippet: str) -> str:
+def detect_location(text: str) -> str:
     cities = ["nyc", "new york", "los angeles", "chicago", "miami", "austin", "seattle", "dallas", "denver", "atlanta", "portland", "phoenix", "detroit", "boston"]
-    text = f"{title} {snippet}".lower()
     for c in cities:
         if c in text:
             return c.title().replace("new york", "NYC")
     return ""
 
+def build_lead(platform: str, title: str, url: str, snippet: str) -> ScrapedLead:
+    lead = ScrapedLead(platform, title, url, snippet)
+    lead.lead_score = "🔥 Hot Lead" if is_high_intent(lead.text) else "🟡 Warm Lead"
+    lead.detected_service = detect_service(lead.text)
+    lead.detected_location = detect_location(lead.text)
+    return lead
+
 # === Fetch Functions ===
-def fetch_serply(keyword: str, endpoint: str, query: str = "") -> List[Dict]:
+def fetch_serply(keyword: str, endpoint: str, query: str = "", num: int = 5) -> List[ScrapedLead]:
     base = "https://api.serply.io/v1/google"
     url = f"{base}/{endpoint}" if endpoint != "organic" else base
     full_query = f"{query} {keyword}".strip()
-    params = {"q": full_query, "num": 5, "gl": "us", "hl": "en"}
+    params = {"q": full_query, "num": num, "gl": "us", "hl": "en"}
 
     try:
         resp = requests.get(url, headers=SERPLY_HEADERS, params=params, timeout=10)
@@ -84,20 +91,7 @@ def fetch_serply(keyword: str, endpoint: str, query: str = "") -> List[Dict]:
                 title = item.get("title", "No title")
                 snippet = item.get("snippet", "No description")[:200] + "..."
                 link = item.get("link", "#")
-                intent = is_high_intent(title, snippet)
-                score = "🔥 Hot Lead" if intent else "🟡 Warm Lead"
-                service = detect_service(title, snippet)
-                location = detect_location(title, snippet)
-
-                results.append({
-                    "platform": "Google News" if endpoint == "news" else "Google",
-                    "title": title,
-                    "url": link,
-                    "snippet": snippet,
-                    "lead_score": score,
-                    "detected_service": service,
-                    "detected_location": location
-                })
+                results.append(build_lead("Google News" if endpoint == "news" else "Google", title, link, snippet))
             return results
         else:
             print(f"Serply {endpoint} error: {resp.status_code}")
@@ -106,7 +100,7 @@ def fetch_serply(keyword: str, endpoint: str, query: str = "") -> List[Dict]:
         print(f"Serply request failed: {e}")
         return []
 
-def fetch_reddit(keyword: str) -> List[Dict]:
+def fetch_reddit(keyword: str) -> List[ScrapedLead]:
     if not REDDIT:
         return []
     try:
@@ -114,43 +108,54 @@ def fetch_reddit(keyword: str) -> List[Dict]:
         for submission in REDDIT.subreddit("all").search(keyword, limit=6, sort="relevance"):
             title = submission.title
             content = (submission.selftext or submission.title)[:200] + "..."
-            intent = is_high_intent(title, content)
-            score = "🔥 Hot Lead" if intent else "🟡 Warm Lead"
-            service = detect_service(title, content) or keyword.title()
-            location = detect_location(title, content)
-
-            results.append({
-                "platform": "Reddit",
-                "title": title,
-                "url": f"https://www.reddit.com{submission.permalink}",
-                "snippet": content,
-                "lead_score": score,
-                "detected_service": service,
-                "detected_location": location
-            })
+            lead = build_lead("Reddit", title, f"https://www.reddit.com{submission.permalink}", content)
+            lead.detected_service = lead.detected_service or keyword.title()
+            results.append(lead)
         return results
     except Exception as e:
         print(f"Reddit fetch error: {e}")
         return []
 
 # === Main Scrape Function ===
-async def scrape(keyword: str, platforms: List[str]) -> List[Dict]:
+async def scrape(keyword: str, platforms: List[str]) -> Tuple[List[ScrapedLead], Dict[str, int]]:
+    # Returns (results, plan) where plan reports Serply calls made, saved and spent topping up,
+    # like scraper_searchapi.search_aggregate
     if not keyword.strip():
-        return []
+        return [], {"upstream_calls": 0, "calls_saved": 0, "topup_calls": 0}
     if not platforms:
         platforms = ["google", "reddit"]
 
+    # site:-restricted Serply platforms share one "(site:a OR site:b) keyword" call
+    serply_sources = {
+        p: (endpoint, query[len("site:"):] if query.startswith("site:") else "")
+        for p, (src_type, endpoint, query) in PLATFORM_SOURCES.items() if src_type == "serply"
+    }
+    groups, saved = plan_queries(platforms, serply_sources)
+    topups = 0
+
+    by_platform: Dict[str, List[ScrapedLead]] = {}
+    for group in groups:
+        try:
+            num = 5 * len(group.platforms)
+            leads = fetch_serply(keyword, group.endpoint, group.site_filter, num=num)
+            split = split_by_site(group, leads, limit=5)
+            topups += top_up(group, split, leads, num, 5, lambda site: fetch_serply(keyword, group.endpoint, site))
+            by_platform.update(split)
+        except Exception as e:
+            print(f"Error fetching {', '.join(group.platforms)}: {e}")
+
     results = []
     for platform in platforms:
         if platform not in PLATFORM_SOURCES:
             continue
-        src_type, endpoint, query = PLATFORM_SOURCES[platform]
+        src_type = PLATFORM_SOURCES[platform][0]
         try:
             if src_type == "serply":
-                results += fetch_serply(keyword, endpoint, query)
+                results += by_platform.get(platform, [])
             elif src_type == "reddit" and REDDIT:
                 results += fetch_reddit(keyword)
         except Exception as e:
             print(f"Error fetching {platform}: {e}")
             continue
-    return results
\ No newline at end of file
+    plan = {"upstream_calls": len(groups) + topups, "calls_saved": max(0, saved - topups), "topup_calls": topups}
+    return results, plan
\ No newline at end of file
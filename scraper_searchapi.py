@@ -2,21 +2,31 @@
 # scraper_searchapi.py — uses searchapi.io (Google engines) and supports DEMO_MODE for offline tests
 import os, re, datetime, requests
 from typing import List, Dict, Tuple, Any
+from failover import HedgedFailover
+from leads import SearchLead
+from planner import plan_queries, split_by_site, top_up
 
 SEARCHAPI_KEY = os.getenv("SEARCHAPI_IO_KEY") or os.getenv("SEARCHAPI_KEY") or os.getenv("SEARCH_API_KEY") or ""
 BASE = "https://www.searchapi.io/api/v1/search"
+SERPLY_API_KEY = os.getenv("SERPLY_API_KEY") or ""
+SERPLY_BASE = "https://api.serply.io/v1/google"
 DEMO_MODE = os.getenv("DEMO_MODE", "0") == "1"
 
+# Platforms served by a site-restricted Google query; the planner ORs them together
+SITE_PLATFORMS = {"twitter": "twitter.com", "youtube": "youtube.com", "stackoverflow": "stackoverflow.com"}
+SEARCH_SOURCES = {"google": ("google", ""), "news": ("news", ""), **{p: ("google", d) for p, d in SITE_PLATFORMS.items()}}
+
 def _mock_google(q: str, page: int, per_page: int) -> Dict[str, Any]:
     # Simple deterministic mock data for tests/offline demo
     base_idx = (page - 1) * per_page
+    sites = re.findall(r"site:([\w.-]+)", q) or ["example.com"]
     items = []
     for i in range(per_page):
         idx = base_idx + i + 1
         items.append({
             "title": f"Result {idx} for {q}",
             "snippet": f"This is a mock snippet containing terms of {q}.",
-            "link": f"https://example.com/{idx}?q={q.replace(' ','+')}",
+            "link": f"https://{sites[i % len(sites)]}/{idx}?q={q.replace(' ','+')}",
             "date": "2024-12-31T12:00:00"
         })
     return {
@@ -41,25 +51,52 @@ def _get(params: Dict[str, Any]) -> Dict[str, Any]:
     r.raise_for_status()
     return r.json()
 
-def _normalize(items: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
-    out = []
-    for it in items:
-        out.append({
-            "title": it.get("title"),
-            "snippet": it.get("snippet") or it.get("description"),
-            "url": it.get("link") or it.get("url"),
-            "source": source,
-            "date": it.get("date") or it.get("date_utc") or it.get("published"),
-        })
-    return out
+def _normalize(items: List[Dict[str, Any]], source: str) -> List[SearchLead]:
+    return [
+        SearchLead(
+            title=it.get("title"),
+            url=it.get("link") or it.get("url"),
+            snippet=it.get("snippet") or it.get("description"),
+            source=source,
+            date=it.get("date") or it.get("date_utc") or it.get("published"),
+        )
+        for it in items
+    ]
 
-def search_google(q: str, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], int]:
+def _searchapi_google(q: str, page: int, per_page: int) -> Tuple[List[SearchLead], int]:
     data = _get({"engine": "google", "q": q, "page": page, "num": per_page})
     items = data.get("organic_results") or data.get("organic") or data.get("results") or []
     total = (data.get("search_information") or {}).get("total_results") or 0
     return _normalize(items, "google"), int(total or 0)
 
-def search_news(q: str, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], int]:
+def _serply_google(q: str, page: int, per_page: int) -> Tuple[List[SearchLead], int]:
+    headers = {"X-API-KEY": SERPLY_API_KEY, "User-Agent": "LeadHunterAI:v1.0 (by u/samadhidagreat)"}
+    params = {"q": q, "num": per_page, "start": (page - 1) * per_page, "gl": "us", "hl": "en"}
+    r = requests.get(SERPLY_BASE, headers=headers, params=params, timeout=30)
+    r.raise_for_status()
+    data = r.json()
+    items = data.get("results") or []
+    # Serply has no Google-style estimate; its total is what it actually returned
+    return _normalize(items, "google"), int(data.get("total") or len(items))
+
+# Both providers serve Google results; the failover hedges the slower one.
+# Only providers with a key are registered; DEMO_MODE stays on the mocked
+# SearchAPI.io path so tests never go online.
+_GOOGLE_PROVIDERS = {}
+if SEARCHAPI_KEY or DEMO_MODE:
+    _GOOGLE_PROVIDERS["searchapi"] = _searchapi_google
+if SERPLY_API_KEY and not DEMO_MODE:
+    _GOOGLE_PROVIDERS["serply"] = _serply_google
+if not _GOOGLE_PROVIDERS:
+    _GOOGLE_PROVIDERS["searchapi"] = _searchapi_google  # no keys at all: surfaces the missing-key error
+GOOGLE_FAILOVER = HedgedFailover(_GOOGLE_PROVIDERS)
+
+def search_google(q: str, page: int, per_page: int) -> Tuple[List[SearchLead], int, str]:
+    # total means different things per provider (see _serply_google), so the winner is returned too
+    (items, total), provider = GOOGLE_FAILOVER.call(q, page, per_page)
+    return items, total, provider
+
+def search_news(q: str, page: int, per_page: int) -> Tuple[List[SearchLead], int]:
     data = _get({"engine": "google_news", "q": q, "page": page, "num": per_page})
     items = data.get("news_results") or data.get("news") or []
     total = len(items)
@@ -73,51 +110,59 @@ def normalize_ts(ds: str) -> float:
     except Exception:
         return 0.0
 
-def dedupe(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def dedupe(items: List[SearchLead]) -> List[SearchLead]:
     seen = set()
     out = []
     for it in items:
-        u = (it.get("url") or "").split("#")[0]
+        u = (it.url or "").split("#")[0]
         if u and u not in seen:
             seen.add(u)
             out.append(it)
     return out
 
-def filter_by_terms(items: List[Dict[str, Any]], q: str) -> List[Dict[str, Any]]:
+def filter_by_terms(items: List[SearchLead], q: str) -> List[SearchLead]:
+    # matches against the lead's pre-lowercased text; only the query is lowered here
     text = q.strip()
-    phrases = re.findall(r'"([^"]+)"', text)
+    phrases = [ph.lower() for ph in re.findall(r'"([^"]+)"', text)]
     if phrases:
-        def has_phrases(s): 
-            s_low = s.lower()
-            return all(ph.lower() in s_low for ph in phrases)
-        return [it for it in items if has_phrases((it.get("title") or "") + " " + (it.get("snippet") or ""))]
+        return [it for it in items if all(ph in it.text for ph in phrases)]
     terms = [t.lower() for t in re.split(r"\s+", text) if t.strip()]
-    def has_terms(s):
-        s_low = s.lower()
-        return all(t in s_low for t in terms)
-    return [it for it in items if has_terms((it.get("title") or "") + " " + (it.get("snippet") or ""))]
+    return [it for it in items if all(t in it.text for t in terms)]
 
-def search_aggregate(q: str, platforms: List[str], page: int, per_page: int, sort: str, only_accounts: bool) -> Tuple[List[Dict[str, Any]], int]:
-    items: List[Dict[str, Any]] = []
+def search_aggregate(q: str, platforms: List[str], page: int, per_page: int, sort: str, only_accounts: bool) -> Tuple[List[SearchLead], int, Dict[str, int], List[str]]:
+    # Returns (items, total, plan, google_providers): plan reports upstream calls made, saved and
+    # spent topping up; google_providers names who answered, since their totals are not comparable
+    groups, saved = plan_queries(platforms, SEARCH_SOURCES, merge=page == 1)
+    by_platform: Dict[str, List[SearchLead]] = {}
     total = 0
-    for p in platforms:
-        if p == "google":
-            res, t = search_google(q, page, per_page)
-        elif p == "news":
+    topups = 0
+    providers: List[str] = []
+    for g in groups:
+        if g.endpoint == "news":
             res, t = search_news(q, page, per_page)
-        elif p == "twitter":
-            res, t = search_google(f'site:twitter.com {q}', page, per_page)
-            if only_accounts:
-                res = [it for it in res if re.search(r"twitter\.com/[^/]+/?$", (it.get('url') or ''))]
+            by_platform.update(split_by_site(g, res, limit=per_page))
         else:
-            res, t = [], 0
-        items.extend(res)
+            # a merged call asks for enough results to fill every platform it covers
+            num = min(100, per_page * len(g.platforms))
+            res, t, provider = search_google(g.query(q), page, num)
+            providers.append(provider)
+            split = split_by_site(g, res, limit=per_page)
+            topups += top_up(g, split, res, num, per_page, lambda site: search_google(f"{site} {q}", page, per_page)[0])
+            by_platform.update(split)
         total += t or 0
 
+    if only_accounts and "twitter" in by_platform:
+        by_platform["twitter"] = [it for it in by_platform["twitter"] if re.search(r"(twitter|x)\.com/[^/]+/?$", it.url or "")]
+
+    items: List[SearchLead] = []
+    for p in dict.fromkeys(platforms):
+        items.extend(by_platform.get(p, []))
+
     items = dedupe(items)
     items = filter_by_terms(items, q)
 
     if sort == "newest":
-        items.sort(key=lambda x: normalize_ts(x.get("date")), reverse=True)
+        items.sort(key=lambda x: normalize_ts(x.date), reverse=True)
 
-    return items, total
+    plan = {"upstream_calls": len(groups) + topups, "calls_saved": max(0, saved - topups), "topup_calls": topups}
+    return items, total, plan, sorted(set(providers))
@@ -1,10 +1,15 @@
 
 # test_local.py — local smoke tests using DEMO_MODE (no real API calls)
-import os
+import os, json, time, threading
 os.environ["DEMO_MODE"] = "1"
 
 from fastapi.testclient import TestClient
 from main_api import app
+from failover import HedgedFailover
+from enricher import Enricher, canonical_url, _PageParser
+from leads import SearchLead, ScrapedLead, dumps
+from planner import plan_queries, split_by_site, top_up
+import scraper_searchapi
 
 client = TestClient(app)
 
@@ -32,4 +37,234 @@ def test_search_phrase_and_load_more():
     assert js1["items"] != js2["items"]  # mock data differs by page
     assert js1["count"] > 0 and js2["count"] > 0
 
+def test_providers_stats():
+    client.get("/search", params={"q": "plumber", "platforms": ["google"]})
+    r = client.get("/providers")
+    assert r.status_code == 200
+    assert r.json()["google"]["searchapi"]["calls"] >= 1
+
+def test_failover_hedges_slow_primary():
+    def slow(q):
+        time.sleep(0.5)
+        return "slow"
+    fo = HedgedFailover({"slow": slow, "fast": lambda q: "fast"}, default_hedge_after=0.05)
+    t0 = time.monotonic()
+    assert fo.call("x") == ("fast", "fast")
+    assert time.monotonic() - t0 < 0.4
+
+def test_failover_on_error():
+    def broken(q):
+        raise RuntimeError("down")
+    fo = HedgedFailover({"broken": broken, "ok": lambda q: q}, default_hedge_after=5)
+    assert fo.call("x") == ("x", "ok")
+    assert fo.ranked() == ["broken", "ok"]  # one transient error does not demote
+    fo.call("x")
+    assert fo.ranked() == ["ok", "broken"]
+
+def test_failover_queue_time_does_not_hedge():
+    calls = {"a": 0, "b": 0}
+    def provider(name):
+        def fetch(q):
+            calls[name] += 1
+            time.sleep(0.2)
+            return name
+        return fetch
+    fo = HedgedFailover({"a": provider("a"), "b": provider("b")}, default_hedge_after=0.5, max_workers=4)
+    threads = [threading.Thread(target=fo.call, args=("x",)) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == {"a": 16, "b": 0}
+
+def test_enrich_canonical_url():
+    assert canonical_url("HTTPS://www.Example.com/post/?utm_source=x&id=3#top") == "https://example.com/post?id=3"
+
+def test_enrich_page_parser():
+    p = _PageParser("https://example.com/post")
+    html = ('<head><meta property="article:published_time" content="2024-05-01">'
+            '<meta name="twitter:creator" content="@jane"></head>'
+            '<body><a href="mailto:jane@example.com">mail</a><a href="/contact">c</a><a href="/about">a</a></body>')
+    for i in range(0, len(html), 16):  # fed in chunks like a streamed body
+        p.feed(html[i:i + 16])
+    assert p.published == "2024-05-01"
+    assert p.author == "@jane"
+    assert p.contacts == ["mailto:jane@example.com", "https://example.com/contact"]
+
+class _StubResponse:
+    def __init__(self, status_code=200, body=b"", headers=None, chunks=1):
+        self.status_code = status_code
+        self.headers = headers or {"Content-Type": "text/html"}
+        self.encoding = "ISO-8859-1" if "html" in self.headers.get("Content-Type", "") else None
+        self.text = body.decode("utf-8")
+        self._body, self._chunks, self.chunks_read = body, chunks, 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size=1):
+        for _ in range(self._chunks):
+            self.chunks_read += 1
+            yield self._body
+
+class _StubSession:
+    # Serves canned responses by URL and records every GET plus per-host concurrency
+    def __init__(self, pages, robots=b"", delay=0.0):
+        self.headers, self.pages, self.robots, self.delay = {}, pages, robots, delay
+        self.gets, self.active, self.max_active = [], {}, {}
+        self.robots_chunks_read = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None, stream=False):
+        host = url.split("/")[2]
+        with self._lock:
+            self.gets.append(url)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        time.sleep(self.delay)
+        with self._lock:
+            self.active[host] -= 1
+        if url.endswith("/robots.txt"):
+            # served in 1000-byte chunks so the cap is observable
+            resp = _StubResponse(headers={"Content-Type": "text/plain"})
+            chunks = [self.robots[i:i + 1000] for i in range(0, len(self.robots), 1000)] or [b""]
+            def iter_content(chunk_size=1):
+                for chunk in chunks:
+                    self.robots_chunks_read += 1
+                    yield chunk
+            resp.iter_content = iter_content
+            return resp
+        page = self.pages.get(url)
+        return page() if callable(page) else page or _StubResponse(404)
+
+_AUTHOR_PAGE = '<meta name="author" content="Zoë">'.encode("utf-8")
+
+def test_enricher_fetches_each_page_once():
+    session = _StubSession({"https://a.com/p": lambda: _StubResponse(body=_AUTHOR_PAGE)}, delay=0.05)
+    enricher = Enricher(session=session)
+    leads = [SearchLead("t", "https://a.com/p", "s", "google") for _ in range(5)]
+    leads.append(SearchLead("t", "https://www.a.com/p/?utm_source=x", "s", "google"))
+    enricher.enrich(leads)
+    enricher.enrich([SearchLead("t", "https://a.com/p#top", "s", "google")])
+    assert session.gets.count("https://a.com/p") == 1
+    assert session.gets.count("https://a.com/robots.txt") == 1
+    assert all(lead.enrichment["author"] == "Zoë" for lead in leads)  # UTF-8 despite no charset
+
+def test_enricher_respects_robots():
+    session = _StubSession({"https://a.com/private": lambda: _StubResponse(body=_AUTHOR_PAGE)}, robots=b"User-agent: *\nDisallow: /private")
+    lead = SearchLead("t", "https://a.com/private", "s", "google")
+    Enricher(session=session).enrich([lead])
+    assert "https://a.com/private" not in session.gets
+    assert lead.enrichment["author"] is None
+
+def test_enricher_caches_permanent_errors():
+    session = _StubSession({})  # every page 404s
+    enricher = Enricher(session=session)
+    for _ in range(3):
+        lead = SearchLead("t", "https://a.com/gone", "s", "google")
+        enricher.enrich([lead])
+        assert lead.enrichment["author"] is None
+    assert session.gets.count("https://a.com/gone") == 1
+
+def test_enricher_caps_robots_txt():
+    session = _StubSession({"https://a.com/private": lambda: _StubResponse(body=_AUTHOR_PAGE)},
+                           robots=b"User-agent: *\nDisallow: /private\n" + b"#" * 10000)
+    lead = SearchLead("t", "https://a.com/private", "s", "google")
+    Enricher(session=session, max_bytes=1000).enrich([lead])
+    assert session.robots_chunks_read == 1
+    assert "https://a.com/private" not in session.gets
+
+def test_enricher_byte_cap():
+    resp = _StubResponse(body=b"x" * 1000, chunks=100)
+    session = _StubSession({"https://a.com/big": lambda: resp})
+    Enricher(session=session, max_bytes=5000).enrich([SearchLead("t", "https://a.com/big", "s", "google")])
+    assert resp.chunks_read == 5
+
+def test_enricher_per_host_limit():
+    pages = {f"https://a.com/{i}": (lambda: _StubResponse(body=b"<p>")) for i in range(8)}
+    pages.update({f"https://b.com/{i}": (lambda: _StubResponse(body=b"<p>")) for i in range(2)})
+    session = _StubSession(pages, delay=0.05)
+    leads = [SearchLead("t", url, "s", "google") for url in pages]
+    Enricher(session=session, per_host=2, max_workers=8).enrich(leads)
+    assert session.max_active["a.com"] <= 2
+    assert all(lead.enrichment is not None for lead in leads)
+
+def test_enricher_retries_failures_and_survives_bad_urls():
+    responses = [_StubResponse(503), _StubResponse(body=_AUTHOR_PAGE)]
+    session = _StubSession({"https://a.com/p": lambda: responses.pop(0)})
+    enricher = Enricher(session=session)
+    first, second = SearchLead("t", "https://a.com/p", "s", "google"), SearchLead("t", "https://a.com/p", "s", "google")
+    enricher.enrich([first, SearchLead("t", "http://a.com:abc/x", "s", "google")])
+    assert first.enrichment is None
+    enricher.enrich([second])
+    assert second.enrichment["author"] == "Zoë"
+
+def test_lead_serialization():
+    lead = SearchLead(title="Need a Plumber", url="https://example.com/1", snippet=None, source="google")
+    assert lead.text == "need a plumber "
+    assert not hasattr(lead, "__dict__")
+    scraped = ScrapedLead("Reddit", "t", "https://reddit.com/x", "s", "🟡 Warm Lead")
+    js = json.loads(dumps({"items": [lead, scraped]}))
+    assert js["items"][0] == {"title": "Need a Plumber", "snippet": None, "url": "https://example.com/1", "source": "google", "date": None}
+    assert js["items"][1] == {"platform": "Reddit", "title": "t", "url": "https://reddit.com/x", "snippet": "s", "lead_score": "🟡 Warm Lead"}
+
+def test_planner_merges_site_platforms():
+    sources = {"google": ("google", ""), "twitter": ("google", "twitter.com"), "youtube": ("google", "youtube.com")}
+    groups, saved = plan_queries(["twitter", "google", "youtube"], sources)
+    assert saved == 1
+    assert [g.platforms for g in groups] == [["twitter", "youtube"], ["google"]]
+    assert groups[0].query("plumber") == "(site:twitter.com OR site:youtube.com) plumber"
+
+def test_planner_split_aliases_and_top_up():
+    sources = {"twitter": ("google", "twitter.com"), "youtube": ("google", "youtube.com")}
+    (group,), _ = plan_queries(["twitter", "youtube"], sources)
+    serp = [SearchLead("t", f"https://x.com/u{i}", "s", "google") for i in range(3)] + [SearchLead("t", "https://youtu.be/v", "s", "google")]
+    split = split_by_site(group, serp, limit=2)
+    assert [len(split["twitter"]), len(split["youtube"])] == [2, 1]
+    queried = []
+    def fetch_site(site):
+        queried.append(site)
+        return [SearchLead("t", "https://youtu.be/v", "s", "google"), SearchLead("t", "https://youtube.com/w", "s", "google")]
+    assert top_up(group, split, serp, requested=4, limit=2, fetch_site=fetch_site) == 1
+    assert queried == ["site:youtube.com"]
+    assert [lead.url for lead in split["youtube"]] == ["https://youtu.be/v", "https://youtube.com/w"]
+    # short page, or a full page padded with off-domain results: nothing was crowded out
+    assert top_up(group, split_by_site(group, serp[:1], limit=2), serp[:1], requested=4, limit=2, fetch_site=fetch_site) == 0
+    junk = serp[:1] + [SearchLead("t", f"https://other.com/{i}", "s", "google") for i in range(3)]
+    assert top_up(group, split_by_site(group, junk, limit=2), junk, requested=4, limit=2, fetch_site=fetch_site) == 0
+    assert queried == ["site:youtube.com"]
+
+def _skewed_serp(q, page, per_page):
+    # 3 twitter : 1 youtube ranking for the merged query, per-site rankings otherwise
+    def site_rank(site, n):
+        return [SearchLead(f"{site} {i} plumber", f"https://{site}/{i}", "s", "google") for i in range(n)]
+    if q.startswith("("):
+        tw, yt = site_rank("twitter.com", 200), site_rank("youtube.com", 200)
+        ranking = [lead for i in range(50) for lead in tw[3 * i:3 * i + 3] + [yt[i]]]
+    else:
+        ranking = site_rank(q.split()[0][len("site:"):], 200)
+    start = (page - 1) * per_page
+    return ranking[start:start + per_page], len(ranking), "stub"
+
+def test_search_merged_pagination_skewed_serp(monkeypatch):
+    monkeypatch.setattr(scraper_searchapi, "search_google", _skewed_serp)
+    pages = []
+    for page in (1, 2):
+        items, _, plan, _ = scraper_searchapi.search_aggregate("plumber", ["twitter", "youtube"], page, 4, "relevance", False)
+        pages.append([it.url for it in items])
+    assert pages[0] == [f"https://twitter.com/{i}" for i in range(4)] + [f"https://youtube.com/{i}" for i in range(4)]
+    assert pages[1] == [f"https://twitter.com/{i}" for i in range(4, 8)] + [f"https://youtube.com/{i}" for i in range(4, 8)]
+    assert plan == {"upstream_calls": 2, "calls_saved": 0, "topup_calls": 0}  # page 2 is never merged
+
+def test_search_merged_platforms():
+    r = client.get("/search", params={"q": "plumber", "platforms": ["twitter", "youtube", "stackoverflow"], "per_page": 3})
+    assert r.status_code == 200
+    js = r.json()
+    assert js["upstream_calls"] == 1 and js["calls_saved"] == 2 and js["topup_calls"] == 0
+    hosts = [it["url"].split("/")[2] for it in js["items"]]
+    assert hosts == ["twitter.com"] * 3 + ["youtube.com"] * 3 + ["stackoverflow.com"] * 3
+
 print("All local tests passed (DEMO_MODE).")